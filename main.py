@@ -1,6 +1,6 @@
 import time
 import sys
-from src.config import TradingConfig
+from src.config import get_config
 from src.data_fetcher import TradingOpportunities
 from src.notifications import Notifier
 from src.strategy import SimpleRSIStrategy
@@ -14,13 +14,13 @@ def main():
 
     try:
         # 1. Initialize Configuration
-        config = TradingConfig()
+        config = get_config()
 
         # 2. Initialize Services
         notifier = Notifier(config)
         strategy = SimpleRSIStrategy(config)
         trader = AlpacaTrader(config, strategy, notifier)
-        data_fetcher = TradingOpportunities(n_stocks=50, n_crypto=50)
+        data_fetcher = TradingOpportunities(n_stocks=50, n_crypto=50, state_path=config.INDICATOR_STATE_PATH)
 
         # 3. Send startup notification
         notifier.send_telegram_message("🤖 **Trading Bot Started** 🤖\nMode: {}"
@@ -46,7 +46,7 @@ def main():
         print(f"An unexpected error occurred: {e}")
         # Attempt to notify on critical failure
         try:
-            config_for_notify = TradingConfig()
+            config_for_notify = get_config()
             notifier_for_notify = Notifier(config_for_notify)
             notifier_for_notify.send_telegram_message(f"🚨 **CRITICAL ERROR** 🚨\nBot shutting down. Error: {e}")
         except Exception as notify_e:
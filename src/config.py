@@ -1,39 +1,67 @@
 import os
+from dataclasses import dataclass, field
+from functools import lru_cache
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+@dataclass(frozen=True, slots=True)
 class TradingConfig:
     """
     Configuration class for the trading bot.
     Loads settings from environment variables.
     """
     # Trading mode: 'paper' or 'live'
-    MODE = os.getenv('ALPACA_MODE', 'paper')
+    MODE: str = field(default_factory=lambda: os.getenv('ALPACA_MODE', 'paper'))
 
-    # Alpaca API credentials
-    API_KEY = os.getenv('ALPACA_API_KEY_ID_PAPER') if MODE == 'paper' else os.getenv('ALPACA_API_KEY_ID_LIVE')
-    API_SECRET = os.getenv('ALPACA_API_SECRET_KEY_PAPER') if MODE == 'paper' else os.getenv('ALPACA_API_SECRET_KEY_LIVE')
-    BASE_URL = 'https://paper-api.alpaca.markets' if MODE == 'paper' else 'https://api.alpaca.markets'
+    # Alpaca API credentials (resolved from MODE in __post_init__)
+    API_KEY: str = field(init=False, repr=False)
+    API_SECRET: str = field(init=False, repr=False)
+    BASE_URL: str = field(init=False)
 
     # Notification service URLs
-    TELEGRAM_URL = f"https://api.telegram.org/bot{os.getenv('TELEGRAM_BOT_TOKEN')}/sendMessage"
-    TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+    TELEGRAM_URL: str = field(default_factory=lambda: f"https://api.telegram.org/bot{os.getenv('TELEGRAM_BOT_TOKEN')}/sendMessage", repr=False)
+    TELEGRAM_CHAT_ID: str = field(default_factory=lambda: os.getenv("TELEGRAM_CHAT_ID"))
+
+    # File where streaming indicator state is kept between runs (unset: recompute from full history)
+    INDICATOR_STATE_PATH: str = field(default_factory=lambda: os.getenv('INDICATOR_STATE_PATH'))
 
     # Risk Management: Percentage of portfolio to risk on a single trade
-    RISK_PER_TRADE = 0.01  # Risk 1% of portfolio per trade
+    RISK_PER_TRADE: float = 0.01  # Risk 1% of portfolio per trade
     
     # Strategy specific settings
-    RSI_OVERSOLD_THRESHOLD = 30
-    RSI_OVERBOUGHT_THRESHOLD = 70
-    TAKE_PROFIT_PERCENTAGE = 5.0 # 5% take profit
-    STOP_LOSS_PERCENTAGE = 2.0 # 2% stop loss
+    RSI_OVERSOLD_THRESHOLD: float = 30
+    RSI_OVERBOUGHT_THRESHOLD: float = 70
+    TAKE_PROFIT_PERCENTAGE: float = 5.0 # 5% take profit
+    STOP_LOSS_PERCENTAGE: float = 2.0 # 2% stop loss
+
+    # Order execution
+    ORDER_MAX_WORKERS: int = 10 # Orders submitted concurrently
+    MAX_REQUESTS_PER_MINUTE: int = 200 # Alpaca REST API rate limit
+    ACCOUNT_CACHE_TTL_SECONDS: float = 60 # Reuse account/positions fetched within this window
+
+    def __post_init__(self):
+        # The dataclass is frozen, so derived fields are set through object.__setattr__
+        if self.MODE == 'paper':
+            object.__setattr__(self, 'API_KEY', os.getenv('ALPACA_API_KEY_ID_PAPER'))
+            object.__setattr__(self, 'API_SECRET', os.getenv('ALPACA_API_SECRET_KEY_PAPER'))
+            object.__setattr__(self, 'BASE_URL', 'https://paper-api.alpaca.markets')
+        else:
+            object.__setattr__(self, 'API_KEY', os.getenv('ALPACA_API_KEY_ID_LIVE'))
+            object.__setattr__(self, 'API_SECRET', os.getenv('ALPACA_API_SECRET_KEY_LIVE'))
+            object.__setattr__(self, 'BASE_URL', 'https://api.alpaca.markets')
 
-    def __init__(self):
         # Basic validation to ensure essential variables are set
         if not all([self.API_KEY, self.API_SECRET]):
             raise ValueError("API_KEY and API_SECRET must be set in the environment variables.")
         if not all([os.getenv('TELEGRAM_BOT_TOKEN'), self.TELEGRAM_CHAT_ID]):
             print("Warning: Telegram notification variables are not fully set.")
 
+
+@lru_cache(maxsize=1)
+def get_config() -> TradingConfig:
+    """
+    Returns the shared TradingConfig, resolving the environment only on first use.
+    """
+    return TradingConfig()
@@ -1,83 +1,236 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
-import yfinance as yf
-from tqdm import tqdm
-from ta.trend import sma_indicator
-from ta.momentum import RSIIndicator
-from ta.volatility import BollingerBands
+from src import indicator_state
+
+# aiohttp, yfinance and the Numba kernels are imported where they are used:
+# together they account for most of the bot's start-up time.
+
+SCREENER_URL = "https://query1.finance.yahoo.com/v1/finance/screener/predefined/saved"
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+INDICATOR_COLUMNS = ["ma14", "rsi14", "ma50", "rsi50", "bb_high", "bb_low"]
 
 class TradingOpportunities:
     """
-    Uses the yfinance Screener to find potential trading opportunities among stocks and crypto.
+    Uses Yahoo Finance predefined screeners to find potential trading opportunities among stocks and crypto.
     Also fetches technical analysis indicators for a list of assets.
     """
-    def __init__(self, n_stocks=25, n_crypto=25):
+    def __init__(self, n_stocks=25, n_crypto=25, verbose=False, state_path=None, stock_screeners=("day_losers",)):
         self.n_stocks = n_stocks
         self.n_crypto = n_crypto
+        # Yahoo predefined screener ids for stocks, e.g. "day_losers", "day_gainers", "most_actives"
+        self.stock_screeners = stock_screeners
+        self.verbose = verbose
+        # When set, indicators are updated incrementally from state persisted at this path
+        self.state_path = state_path
+        self._states = indicator_state.load_states(state_path) if state_path else {}
         self.all_tickers = []
         self.opportunities_df = pd.DataFrame()
+        # Indicator values keyed by a hash of the close series they were computed from (LRU)
+        self._ind_cache = OrderedDict()
 
     @staticmethod
-    def _screener_to_df(predefined_id, size, asset_type, alpaca_symbol_fn):
-        """Fetches a Yahoo Finance predefined screener and returns a minimal DataFrame."""
-        screener = yf.Screener()
-        screener.set_predefined_body(predefined_id)
-        screener.size = size
-        quotes = screener.response.get("quotes", [])
-        if not quotes:
+    async def _fetch_json(session, url, params):
+        """Fetches a URL and returns the decoded JSON body."""
+        async with session.get(url, params=params) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def _fetch_screeners(self, screeners):
+        """
+        Fetches several predefined screeners concurrently.
+
+        Args:
+            screeners (list): (predefined_id, size) tuples.
+
+        Returns:
+            list: The JSON response of each screener, or the exception raised while fetching it.
+        """
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(limit=20, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=HEADERS) as session:
+            tasks = [
+                self._fetch_json(session, SCREENER_URL, {"scrIds": predefined_id, "count": size})
+                for predefined_id, size in screeners
+            ]
+            return await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    def _screener_to_df(response, size, asset_type, alpaca_symbol_fn):
+        """Turns a Yahoo Finance predefined screener response into a minimal DataFrame."""
+        result = response.get("finance", {}).get("result") or [{}]
+        # Only the symbol is needed, so it is read straight from the JSON quotes
+        # instead of building a DataFrame with every quote field
+        symbols = [quote["symbol"] for quote in result[0].get("quotes", [])[:size] if "symbol" in quote]
+        if not symbols:
             return pd.DataFrame()
-        df = pd.DataFrame(quotes)
-        # yfinance returns lowercase 'symbol'
-        if "symbol" in df.columns:
-            df = df.rename(columns={"symbol": "Symbol"})
-        df = df[["Symbol"]].head(size).copy()
-        df["asset_type"] = asset_type
-        df["alpaca_symbol"] = df["Symbol"].apply(alpaca_symbol_fn)
-        return df
+        return pd.DataFrame({
+            "Symbol": symbols,
+            "asset_type": [asset_type] * len(symbols),
+            "alpaca_symbol": [alpaca_symbol_fn(s) for s in symbols],
+        })
 
     def find_opportunities(self):
         """
-        Fetches top crypto and losing stocks from Yahoo Finance to identify opportunities.
-        Uses yfinance Screener (no browser/Chromium required).
+        Fetches top crypto and screened stocks (top losers by default) from Yahoo Finance to identify opportunities.
+        All screeners are requested concurrently as JSON (no browser/Chromium required).
         """
         print("Finding trading opportunities...")
         dfs = []
 
-        # --- Crypto (top by market cap) ---
-        try:
-            df_crypto = self._screener_to_df(
-                predefined_id="all_cryptocurrencies_us",
-                size=self.n_crypto,
-                asset_type="crypto",
-                # BTC-USD -> BTC/USD  (replace hyphen, no extra suffix needed)
-                alpaca_symbol_fn=lambda s: s.replace("-", "/"),
-            )
-            if not df_crypto.empty:
-                dfs.append(df_crypto)
-        except Exception as e:
-            print(f"Could not fetch crypto data: {e}")
-
-        # --- Stocks (Top Losers) ---
-        try:
-            df_stock = self._screener_to_df(
-                predefined_id="day_losers",
-                size=self.n_stocks,
-                asset_type="stock",
-                alpaca_symbol_fn=lambda s: s,
-            )
-            if not df_stock.empty:
-                dfs.append(df_stock)
-        except Exception as e:
-            print(f"Could not fetch stock data: {e}")
+        screeners = [
+            # --- Crypto (top by market cap) ---
+            # BTC-USD -> BTC/USD  (replace hyphen, no extra suffix needed)
+            ("all_cryptocurrencies_us", self.n_crypto, "crypto", lambda s: s.replace("-", "/")),
+            # --- Stocks (Top Losers by default) ---
+            *[(predefined_id, self.n_stocks, "stock", lambda s: s) for predefined_id in self.stock_screeners],
+        ]
+        responses = asyncio.run(self._fetch_screeners([(predefined_id, size) for predefined_id, size, _, _ in screeners]))
+
+        for (_, size, asset_type, alpaca_symbol_fn), response in zip(screeners, responses):
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                df_page = self._screener_to_df(response, size, asset_type, alpaca_symbol_fn)
+                if not df_page.empty:
+                    dfs.append(df_page)
+            except Exception as e:
+                print(f"Could not fetch {asset_type} data: {e}")
 
         if not dfs:
             print("No opportunities found.")
             return self.opportunities_df
 
-        self.opportunities_df = pd.concat(dfs, axis=0).reset_index(drop=True)
+        # A stock can show up in several screeners (e.g. most active and top loser)
+        self.opportunities_df = pd.concat(dfs, axis=0).drop_duplicates("Symbol").reset_index(drop=True)
         self.all_tickers = self.opportunities_df["Symbol"].tolist()
         print(f"Found {len(self.opportunities_df)} potential opportunities.")
         return self.opportunities_df
 
+    @staticmethod
+    def _close_key(close):
+        """Content hash of a close series. Missing bars are ignored, as they are by the kernels."""
+        return hashlib.blake2b(close[~np.isnan(close)].tobytes(), digest_size=16).digest()
+
+    def _cached_indicators(self, close_arr):
+        """
+        Returns the indicators for every column of `close_arr`, only running the kernels
+        for close series that have not been seen before.
+        """
+        from src import indicators_nb
+
+        keys = [self._close_key(close_arr[:, j]) for j in range(close_arr.shape[1])]
+        missing = [j for j, key in enumerate(keys) if key not in self._ind_cache]
+        if missing:
+            values = indicators_nb.indicators_last(close_arr[:, missing])
+            for j, row in zip(missing, values):
+                self._ind_cache[keys[j]] = tuple(row)
+
+        rows = []
+        for key in keys:
+            self._ind_cache.move_to_end(key)
+            rows.append(self._ind_cache[key])
+
+        # Keep at most one entry per tracked symbol, dropping the least recently used
+        max_entries = max(self.n_stocks + self.n_crypto, len(keys))
+        while len(self._ind_cache) > max_entries:
+            self._ind_cache.popitem(last=False)
+        return rows
+
+    def _download(self, tickers, period):
+        """
+        Downloads daily history for `tickers` in one bulk yfinance request.
+        Grouped by column, so the Close matrix is a plain selection rather than a per-ticker copy.
+        """
+        import yfinance as yf
+
+        data = yf.download(tickers, period=period, interval="1d", group_by='column',
+                           auto_adjust=True, progress=self.verbose)
+        return pd.DataFrame() if data is None else data
+
+    @staticmethod
+    def _latest_bars(data, indicators):
+        """Joins the latest bar of each asset in `data` with its indicator row."""
+        df_tech = data.iloc[-1].unstack(level=0).join(indicators, how="inner")
+        df_tech = df_tech.rename_axis("Symbol").reset_index()
+        df_tech["Date"] = data.index[-1]
+        return df_tech
+
+    def _batch_indicators(self):
+        """Computes indicators from a full year of history for every ticker."""
+        data = self._download(self.all_tickers, "1y")
+        if data.empty:
+            return pd.DataFrame()
+
+        # Wide (dates x tickers) matrix, so every indicator is a single compiled pass over all assets
+        close_df = data['Close']
+        close_arr = close_df.to_numpy(np.float64, copy=False)
+
+        indicators = pd.DataFrame(self._cached_indicators(close_arr), index=close_df.columns, columns=INDICATOR_COLUMNS)
+        return self._latest_bars(data, indicators)
+
+    def _streaming_indicators(self):
+        """
+        Updates the persisted per-symbol indicator state with only the most recent bars.
+        Symbols without state, whose state is older than the recent bars, or whose past
+        closes were adjusted since (splits, dividends) are seeded from a full year of history.
+        """
+        dfs = []
+        stale = [symbol for symbol in self.all_tickers if symbol not in self._states]
+        warm = [symbol for symbol in self.all_tickers if symbol in self._states]
+
+        if warm:
+            data = self._download(warm, "5d")
+            fresh = []
+            if not data.empty:
+                close_df = data['Close']
+                for symbol in close_df.columns:
+                    closes = close_df[symbol].dropna()
+                    state = self._states[symbol]
+                    # A gap larger than the fetched window can't be bridged incrementally
+                    if closes.empty or state.last_date is None or state.last_date < closes.index[0]:
+                        continue
+                    # Adjusted closes that changed since they were applied can't be patched in place
+                    if not state.matches(closes.items()):
+                        continue
+                    for date, price in closes.items():
+                        state.update(date, float(price))
+                    fresh.append(symbol)
+            stale += [symbol for symbol in warm if symbol not in fresh]
+            if fresh:
+                indicators = pd.DataFrame([self._states[s].values() for s in fresh], index=fresh, columns=INDICATOR_COLUMNS)
+                dfs.append(self._latest_bars(data, indicators))
+
+        if stale:
+            data = self._download(stale, "1y")
+            if not data.empty:
+                close_df = data['Close']
+                seeded = []
+                for symbol in close_df.columns:
+                    state = indicator_state.SymbolState()
+                    state.seed((date, float(price)) for date, price in close_df[symbol].dropna().items())
+                    # Tickers that failed to download have no bars to seed from
+                    if state.last_date is None:
+                        continue
+                    self._states[symbol] = state
+                    seeded.append(symbol)
+                if seeded:
+                    indicators = pd.DataFrame([self._states[s].values() for s in seeded], index=seeded, columns=INDICATOR_COLUMNS)
+                    dfs.append(self._latest_bars(data, indicators))
+
+        # Only keep seeded state for the assets currently being tracked
+        self._states = {
+            s: state for s, state in self._states.items()
+            if s in self.all_tickers and state.last_date is not None
+        }
+        indicator_state.save_states(self._states, self.state_path)
+
+        return pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
+
     def get_technical_indicators(self):
         """
         Fetches historical data and calculates technical indicators for the found opportunities.
@@ -87,40 +240,14 @@ class TradingOpportunities:
             return pd.DataFrame()
 
         print(f"Grabbing technical metrics for {len(self.all_tickers)} assets...")
-        df_tech_list = []
-        
-        # Use yfinance's download for efficiency
-        data = yf.download(self.all_tickers, period="1y", interval="1d", group_by='ticker', auto_adjust=True)
-
-        for symbol in tqdm(self.all_tickers, desc="Calculating Indicators"):
-            try:
-                hist = data[symbol].copy() if len(self.all_tickers) > 1 else data
-                if hist.empty or 'Close' not in hist.columns:
-                    # print(f"Warning: No data or 'Close' column for {symbol}. Skipping.")
-                    continue
-
-                # Calculate indicators
-                for n in [14, 50]: # Using fewer indicators for simplicity
-                    hist[f"ma{n}"] = sma_indicator(close=hist["Close"], window=n, fillna=False)
-                    hist[f"rsi{n}"] = RSIIndicator(close=hist["Close"], window=n).rsi()
-                
-                # Bollinger Bands
-                bb = BollingerBands(close=hist["Close"], window=20, window_dev=2)
-                hist["bb_high"] = bb.bollinger_hband()
-                hist["bb_low"] = bb.bollinger_lband()
-
-                df_tech_temp = hist.tail(1).copy()
-                df_tech_temp["Symbol"] = symbol
-                df_tech_list.append(df_tech_temp)
 
-            except Exception as e:
-                # print(f"Could not process {symbol}: {e}")
-                pass
-        
-        if not df_tech_list:
+        if self.state_path:
+            df_tech = self._streaming_indicators()
+        else:
+            df_tech = self._batch_indicators()
+        if df_tech.empty:
             return pd.DataFrame()
 
-        df_tech = pd.concat(df_tech_list).reset_index()
         # Merge technicals back with the original opportunities dataframe
         self.opportunities_df = self.opportunities_df.merge(df_tech, on="Symbol", how="left")
         
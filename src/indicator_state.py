@@ -0,0 +1,174 @@
+import copy
+import math
+import os
+import pickle
+from collections import deque
+
+# Bars kept per symbol to detect rewritten history, matching the 5-day incremental download
+RECENT_BARS = 5
+
+
+class SMAState:
+    """
+    Simple moving average updated one close at a time in O(1).
+    """
+    def __init__(self, window: int):
+        self.window = window
+        self.prices = deque(maxlen=window)
+        self.total = 0.0
+
+    def update(self, price: float):
+        if len(self.prices) == self.window:
+            self.total -= self.prices[0]
+        self.prices.append(price)
+        self.total += price
+
+    @property
+    def value(self) -> float:
+        if len(self.prices) < self.window:
+            return math.nan
+        return self.total / self.window
+
+
+class RSIState:
+    """
+    Relative Strength Index with Wilder smoothing (alpha = 1/window), updated in O(1).
+    """
+    def __init__(self, window: int):
+        self.window = window
+        self.prev_price = None
+        self.avg_up = 0.0
+        self.avg_dn = 0.0
+        self.count = 0
+
+    def update(self, price: float):
+        # Seeded like ta's RSIIndicator: the first bar enters the averages as a 0.0 move
+        up = dn = 0.0
+        if self.prev_price is not None:
+            delta = price - self.prev_price
+            up = max(delta, 0.0)
+            dn = max(-delta, 0.0)
+        self.avg_up += (up - self.avg_up) / self.window
+        self.avg_dn += (dn - self.avg_dn) / self.window
+        self.count += 1
+        self.prev_price = price
+
+    @property
+    def value(self) -> float:
+        if self.count < self.window:
+            return math.nan
+        if self.avg_dn == 0.0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + self.avg_up / self.avg_dn)
+
+
+class BBState:
+    """
+    Bollinger Bands (population standard deviation) from running sums, updated in O(1).
+    """
+    def __init__(self, window: int, k: float = 2.0):
+        self.window = window
+        self.k = k
+        self.prices = deque(maxlen=window)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def update(self, price: float):
+        if len(self.prices) == self.window:
+            oldest = self.prices[0]
+            self.total -= oldest
+            self.total_sq -= oldest * oldest
+        self.prices.append(price)
+        self.total += price
+        self.total_sq += price * price
+
+    @property
+    def value(self) -> tuple:
+        """(high, low) band values."""
+        if len(self.prices) < self.window:
+            return math.nan, math.nan
+        mid = self.total / self.window
+        std = math.sqrt(max(self.total_sq / self.window - mid * mid, 0.0))
+        return mid + self.k * std, mid - self.k * std
+
+
+class SymbolState:
+    """
+    Streaming indicators for one symbol, fed one daily close at a time.
+
+    Updating with the date of the latest bar again (e.g. while today's bar is still
+    forming) replaces that bar instead of adding a new one.
+    """
+    def __init__(self):
+        self.last_date = None
+        self.indicators = [SMAState(14), RSIState(14), SMAState(50), RSIState(50), BBState(20, 2.0)]
+        self._before_last = None
+        # The latest (date, close) bars, to check later downloads against
+        self.recent = deque(maxlen=RECENT_BARS)
+
+    def update(self, date, price: float):
+        if math.isnan(price) or (self.last_date is not None and date < self.last_date):
+            return
+        if date == self.last_date:
+            self.indicators = copy.deepcopy(self._before_last)
+            self.recent.pop()
+        else:
+            self._before_last = copy.deepcopy(self.indicators)
+        for indicator in self.indicators:
+            indicator.update(price)
+        self.recent.append((date, price))
+        self.last_date = date
+
+    def seed(self, closes):
+        """
+        Feeds a history of (date, price) bars in order. Only the last bar is snapshotted,
+        since it is the only one a later update for the same date can replace.
+        """
+        bars = [(date, price) for date, price in closes if not math.isnan(price)]
+        for date, price in bars[:-1]:
+            if self.last_date is not None and date <= self.last_date:
+                continue
+            for indicator in self.indicators:
+                indicator.update(price)
+            self.recent.append((date, price))
+            self.last_date = date
+        if bars:
+            self.update(*bars[-1])
+
+    def matches(self, closes, rel_tol: float = 1e-4) -> bool:
+        """
+        Whether a fresh (date, price) history agrees with the bars already applied.
+        Adjusted closes are rewritten after a split or dividend, which the running
+        indicators can't absorb. The latest bar is not compared, as it may have still
+        been forming, and a history without other overlapping bars doesn't match.
+        """
+        # States saved before bars were recorded have nothing to compare against
+        seen = dict(list(getattr(self, 'recent', ()))[:-1])
+        overlap = [(seen[date], price) for date, price in closes if date in seen]
+        return bool(overlap) and all(math.isclose(old, new, rel_tol=rel_tol) for old, new in overlap)
+
+    def values(self) -> tuple:
+        """Latest (ma14, rsi14, ma50, rsi50, bb_high, bb_low)."""
+        ma14, rsi14, ma50, rsi50, bb20 = self.indicators
+        return (ma14.value, rsi14.value, ma50.value, rsi50.value, *bb20.value)
+
+
+def load_states(path: str) -> dict:
+    """Loads the SymbolState dict saved by a previous run, or an empty dict."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ModuleNotFoundError) as e:
+        print(f"Could not load indicator state from {path}: {e}")
+        return {}
+
+
+def save_states(states: dict, path: str):
+    """Persists the SymbolState dict for the next run."""
+    try:
+        with open(path, 'wb') as f:
+            pickle.dump(states, f)
+    except OSError as e:
+        print(f"Could not save indicator state to {path}: {e}")
@@ -0,0 +1,131 @@
+import numpy as np
+from numba import njit, prange
+
+# All kernels take a 2-D close matrix of shape (bars, symbols), as returned by
+# yfinance for many tickers, and return the indicator value at the latest bar
+# for every symbol. Missing bars (NaN) are skipped, so assets trading on
+# different calendars (crypto vs. stocks) still get full windows.
+#
+# Kernels compile to native code that releases the GIL (nogil) and uses NumPy's
+# error model, so divisions carry no Python-style zero-division checks; every
+# division below is either guarded or by a positive window length.
+
+
+@njit(cache=True, nogil=True, error_model='numpy')
+def _last_valid(col, n):
+    """The last `n` valid closes of one symbol (oldest first), or None if there are fewer."""
+    window = np.empty(n)
+    count = 0
+    i = col.shape[0] - 1
+    while i >= 0 and count < n:
+        if not np.isnan(col[i]):
+            count += 1
+            window[n - count] = col[i]
+        i -= 1
+    if count < n:
+        return None
+    return window
+
+
+@njit(cache=True, nogil=True, error_model='numpy')
+def _sma_col(col, n):
+    window = _last_valid(col, n)
+    if window is None:
+        return np.nan
+    return window.mean()
+
+
+@njit(cache=True, nogil=True, error_model='numpy')
+def _rsi_col(col, n):
+    # Seeded like ta's RSIIndicator: the first bar has no previous close and enters the
+    # averages as a 0.0 move, and it counts towards the `n` observations needed.
+    alpha = 1.0 / n
+    prev = np.nan
+    avg_up = 0.0
+    avg_dn = 0.0
+    count = 0
+    for i in range(col.shape[0]):
+        price = col[i]
+        if np.isnan(price):
+            continue
+        up = 0.0
+        dn = 0.0
+        if not np.isnan(prev):
+            delta = price - prev
+            up = delta if delta > 0 else 0.0
+            dn = -delta if delta < 0 else 0.0
+        avg_up += alpha * (up - avg_up)
+        avg_dn += alpha * (dn - avg_dn)
+        count += 1
+        prev = price
+    if count < n:
+        return np.nan
+    if avg_dn == 0.0:
+        return 100.0
+    return 100.0 - 100.0 / (1.0 + avg_up / avg_dn)
+
+
+@njit(cache=True, nogil=True, error_model='numpy')
+def _bbands_col(col, n, k):
+    window = _last_valid(col, n)
+    if window is None:
+        return np.nan, np.nan
+    mid = window.mean()
+    std = np.sqrt(((window - mid) ** 2).sum() / n)
+    return mid + k * std, mid - k * std
+
+
+@njit(cache=True, nogil=True, parallel=True, error_model='numpy')
+def sma_last(close_2d, n):
+    """Simple moving average over the last `n` valid closes of each symbol."""
+    n_symbols = close_2d.shape[1]
+    out = np.empty(n_symbols)
+    for j in prange(n_symbols):
+        out[j] = _sma_col(close_2d[:, j], n)
+    return out
+
+
+@njit(cache=True, nogil=True, parallel=True, error_model='numpy')
+def rsi_last(close_2d, n):
+    """Relative Strength Index using Wilder smoothing (alpha = 1/n), like ta's RSIIndicator."""
+    n_symbols = close_2d.shape[1]
+    out = np.empty(n_symbols)
+    for j in prange(n_symbols):
+        out[j] = _rsi_col(close_2d[:, j], n)
+    return out
+
+
+@njit(cache=True, nogil=True, parallel=True, error_model='numpy')
+def bbands_last(close_2d, n, k):
+    """Bollinger Bands (mid +/- k standard deviations) over the last `n` valid closes.
+
+    Uses the population standard deviation (ddof=0), as ta's BollingerBands does.
+
+    Returns:
+        tuple: (high, low) arrays, one value per symbol.
+    """
+    n_symbols = close_2d.shape[1]
+    high = np.empty(n_symbols)
+    low = np.empty(n_symbols)
+    for j in prange(n_symbols):
+        high[j], low[j] = _bbands_col(close_2d[:, j], n, k)
+    return high, low
+
+
+@njit(cache=True, nogil=True, parallel=True, error_model='numpy')
+def indicators_last(close_2d):
+    """All indicators used by the bot in one parallel pass, one symbol per task.
+
+    Returns:
+        np.ndarray: (symbols, 6) matrix of ma14, rsi14, ma50, rsi50, bb_high, bb_low.
+    """
+    n_symbols = close_2d.shape[1]
+    out = np.empty((n_symbols, 6))
+    for j in prange(n_symbols):
+        col = close_2d[:, j]
+        out[j, 0] = _sma_col(col, 14)
+        out[j, 1] = _rsi_col(col, 14)
+        out[j, 2] = _sma_col(col, 50)
+        out[j, 3] = _rsi_col(col, 50)
+        out[j, 4], out[j, 5] = _bbands_col(col, 20, 2.0)
+    return out
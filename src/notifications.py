@@ -1,4 +1,5 @@
 import requests
+from requests.adapters import HTTPAdapter
 from src.config import TradingConfig
 
 class Notifier:
@@ -7,6 +8,9 @@ class Notifier:
     """
     def __init__(self, config: TradingConfig):
         self.config = config
+        # Reuse one keep-alive connection for every message instead of a new TLS handshake each time
+        self._session = requests.Session()
+        self._session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
 
     def send_telegram_message(self, message: str):
         """
@@ -25,7 +29,7 @@ class Notifier:
             'parse_mode': 'HTML'
         }
         try:
-            response = requests.post(self.config.TELEGRAM_URL, data=payload, timeout=10)
+            response = self._session.post(self.config.TELEGRAM_URL, data=payload, timeout=10)
             response.raise_for_status()
             print("Telegram notification sent successfully.")
         except requests.exceptions.RequestException as e:
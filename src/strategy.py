@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from enum import Enum
 from src.config import TradingConfig
@@ -29,6 +30,39 @@ class BaseStrategy:
         """
         raise NotImplementedError("This method should be implemented by subclasses.")
 
+    def candidates_mask(self, df: pd.DataFrame, positions: dict) -> pd.Series:
+        """
+        Cheap pre-filter selecting the assets that could lead to a trade.
+        By default every asset is a candidate.
+
+        Args:
+            df (pd.DataFrame): One row per asset, including 'alpaca_symbol' and technical indicators.
+            positions (dict): Alpaca position objects keyed by symbol.
+
+        Returns:
+            pd.Series: Boolean mask, indexed like `df`.
+        """
+        return pd.Series(True, index=df.index)
+
+    def decide_actions(self, df: pd.DataFrame, positions: dict) -> pd.Series:
+        """
+        Makes a trading decision for every asset in a DataFrame.
+        Strategies can override this with a vectorized version; by default it calls
+        'decide_action' row by row.
+
+        Args:
+            df (pd.DataFrame): One row per asset, including 'alpaca_symbol' and technical indicators.
+            positions (dict): Alpaca position objects keyed by symbol.
+
+        Returns:
+            pd.Series: An Action for each row, indexed like `df`.
+        """
+        return pd.Series(
+            [self.decide_action(row, positions.get(row['alpaca_symbol'])) for _, row in df.iterrows()],
+            index=df.index,
+            dtype=object,
+        )
+
 
 class SimpleRSIStrategy(BaseStrategy):
     """
@@ -36,6 +70,14 @@ class SimpleRSIStrategy(BaseStrategy):
     - BUY when RSI is oversold.
     - SELL when a take profit/stop loss is hit or RSI is overbought.
     """
+    def __init__(self, config: TradingConfig):
+        super().__init__(config)
+        # Thresholds are resolved once, so decide_action only compares local values
+        self._oversold = config.RSI_OVERSOLD_THRESHOLD
+        self._overbought = config.RSI_OVERBOUGHT_THRESHOLD
+        self._tp = 1 + config.TAKE_PROFIT_PERCENTAGE / 100
+        self._sl = 1 - config.STOP_LOSS_PERCENTAGE / 100
+
     def decide_action(self, asset_data: pd.Series, existing_position=None) -> Action:
         """
         Implements the simple RSI strategy.
@@ -49,23 +91,23 @@ class SimpleRSIStrategy(BaseStrategy):
                 entry_price = float(existing_position.avg_entry_price)
                 
                 # Take Profit
-                if current_price >= entry_price * (1 + self.config.TAKE_PROFIT_PERCENTAGE / 100):
+                if current_price >= entry_price * self._tp:
                     print(f"{asset_data['Symbol']}: TAKE PROFIT triggered.")
                     return Action.SELL
                 
                 # Stop Loss
-                if current_price <= entry_price * (1 - self.config.STOP_LOSS_PERCENTAGE / 100):
+                if current_price <= entry_price * self._sl:
                     print(f"{asset_data['Symbol']}: STOP LOSS triggered.")
                     return Action.SELL
                 
                 # RSI Overbought
-                if rsi_14 > self.config.RSI_OVERBOUGHT_THRESHOLD:
+                if rsi_14 > self._overbought:
                     print(f"{asset_data['Symbol']}: RSI OVERBOUGHT triggered.")
                     return Action.SELL
 
             # --- BUY LOGIC ---
             else: # No existing position, so only consider buying
-                if rsi_14 < self.config.RSI_OVERSOLD_THRESHOLD:
+                if rsi_14 < self._oversold:
                     print(f"{asset_data['Symbol']}: RSI OVERSOLD triggered.")
                     return Action.BUY
 
@@ -75,3 +117,46 @@ class SimpleRSIStrategy(BaseStrategy):
         except (KeyError, TypeError):
             # This can happen if technical indicator data is missing for an asset
             return Action.HOLD
+
+    def candidates_mask(self, df: pd.DataFrame, positions: dict) -> pd.Series:
+        """
+        Held assets, plus assets whose RSI is outside the HOLD zone.
+        """
+        rsi_14 = df['rsi14']
+        held = df['entry_price'].notna() if 'entry_price' in df else df['alpaca_symbol'].isin(positions)
+        return (rsi_14 < self._oversold) | (rsi_14 > self._overbought) | held
+
+    def decide_actions(self, df: pd.DataFrame, positions: dict) -> pd.Series:
+        """
+        Vectorized version of 'decide_action' over all assets at once.
+        """
+        try:
+            close = df['Close']
+            rsi_14 = df['rsi14']
+            # Prefer the entry prices already joined on by the trader
+            if 'entry_price' in df:
+                entry_price = df['entry_price']
+            else:
+                entry_price = df['alpaca_symbol'].map(
+                    lambda s: float(positions[s].avg_entry_price) if s in positions else np.nan
+                )
+        except KeyError:
+            # Technical indicator data is missing altogether
+            return pd.Series(Action.HOLD, index=df.index, dtype=object)
+
+        held = entry_price.notna()
+        # Conditions in priority order, as checked in decide_action
+        triggers = [
+            ("TAKE PROFIT", Action.SELL, held & (close >= entry_price * self._tp)),
+            ("STOP LOSS", Action.SELL, held & (close <= entry_price * self._sl)),
+            ("RSI OVERBOUGHT", Action.SELL, held & (rsi_14 > self._overbought)),
+            ("RSI OVERSOLD", Action.BUY, ~held & (rsi_14 < self._oversold)),
+        ]
+        conditions = [mask.to_numpy() for _, _, mask in triggers]
+        actions = np.select(conditions, [action for _, action, _ in triggers], default=Action.HOLD)
+        reasons = np.select(conditions, [reason for reason, _, _ in triggers], default="")
+
+        for symbol, reason in zip(df['Symbol'].to_numpy()[reasons != ""], reasons[reasons != ""]):
+            print(f"{symbol}: {reason} triggered.")
+
+        return pd.Series(actions, index=df.index, dtype=object)
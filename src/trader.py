@@ -1,10 +1,53 @@
-import alpaca_trade_api as tradeapi
-from alpaca_trade_api.rest import APIError
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from src.config import TradingConfig
 from src.notifications import Notifier
 from src.strategy import BaseStrategy, Action
 import pandas as pd
 
+class RateLimiter:
+    """
+    Thread-safe token bucket that limits how many requests are sent per period.
+    """
+    def __init__(self, rate: int, period: float = 60.0):
+        self.capacity = rate
+        self.tokens = float(rate)
+        self.fill_rate = rate / period
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Consumes a token if one is available. Returns 0, or the seconds to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.fill_rate)
+            self.last_refill = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.fill_rate
+
+    def acquire(self):
+        """Blocks until a token is available, then consumes it."""
+        wait = self._reserve()
+        while wait > 0:
+            time.sleep(wait)
+            wait = self._reserve()
+
+    async def acquire_async(self):
+        """Waits, without blocking the event loop, until a token is available, then consumes it."""
+        wait = self._reserve()
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self._reserve()
+
+
 class AlpacaTrader:
     """
     The main trader class that connects to Alpaca, manages trades,
@@ -14,18 +57,44 @@ class AlpacaTrader:
         self.config = config
         self.strategy = strategy
         self.notifier = notifier
+        # Imported here rather than at module level, as the SDK is slow to import
+        import alpaca_trade_api as tradeapi
+        # Bound once for the error handlers below, which can't import it at module level either
+        self._APIError = tradeapi.rest.APIError
         self.api = tradeapi.REST(
             key_id=self.config.API_KEY,
             secret_key=self.config.API_SECRET,
             base_url=self.config.BASE_URL,
             api_version='v2'
         )
+        self.api._session = self._build_session()
+        self.rate_limiter = RateLimiter(self.config.MAX_REQUESTS_PER_MINUTE)
         self.account_info = None
         self.positions = {}
+        # Account and positions only change when we place orders, so they are re-fetched
+        # after an order (dirty) or once the cached copy is older than the TTL
+        self._positions_dirty = True
+        self._last_account_update = None
         self._update_account_and_positions()
 
+    def _build_session(self) -> requests.Session:
+        """
+        Keep-alive session shared by all Alpaca REST calls, with backoff on transient server errors.
+        429/504 are left to the SDK's own retry loop, and POSTs (orders) are never retried here.
+        """
+        session = requests.Session()
+        session.headers['Connection'] = 'keep-alive'
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[500, 502, 503], raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(8, self.config.ORDER_MAX_WORKERS), max_retries=retry)
+        session.mount('https://', adapter)
+        return session
+
     def _update_account_and_positions(self):
-        """Fetches the latest account info and open positions from Alpaca."""
+        """Fetches the latest account info and open positions from Alpaca, unless the cached ones are still valid."""
+        if (not self._positions_dirty and self._last_account_update is not None
+                and time.monotonic() - self._last_account_update < self.config.ACCOUNT_CACHE_TTL_SECONDS):
+            return
+
         try:
             self.account_info = self.api.get_account()
             print(f"Account Status: {self.account_info.status}, Buying Power: {self.account_info.buying_power}")
@@ -34,13 +103,25 @@ class AlpacaTrader:
             positions_list = self.api.list_positions()
             self.positions = {pos.symbol: pos for pos in positions_list}
             print(f"Currently holding {len(self.positions)} positions.")
+            self._positions_dirty = False
+            self._last_account_update = time.monotonic()
 
-        except APIError as e:
+        except self._APIError as e:
             print(f"Error updating account info from Alpaca: {e}")
             self.notifier.send_telegram_message(f"🚨 **CRITICAL ERROR** 🚨\nCould not connect to Alpaca API: {e}")
             raise
 
-    def submit_order(self, symbol: str, qty: float, side: str):
+    def _notify_order_submitted(self, symbol: str, qty: float, side: str):
+        message = f"✅ **{side.upper()} ORDER SUBMITTED** ✅\nSymbol: {symbol}\nQuantity: {qty}"
+        self.notifier.send_telegram_message(message)
+        print(message)
+
+    def _notify_order_failed(self, symbol: str, side: str, error: Exception):
+        print(f"Error submitting {side} order for {symbol}: {error}")
+        error_message = f"⚠️ **ORDER FAILED** ⚠️\nSymbol: {symbol}\nSide: {side}\nError: {error}"
+        self.notifier.send_telegram_message(error_message)
+
+    def submit_order(self, symbol: str, qty: float, side: str, client_order_id: str = None):
         """
         Submits a market order to Alpaca and sends a notification.
 
@@ -48,26 +129,159 @@ class AlpacaTrader:
             symbol (str): The symbol of the asset to trade.
             qty (float): The quantity to trade.
             side (str): 'buy' or 'sell'.
+            client_order_id (str): Optional unique id, so a retried order can't be placed twice.
         """
         print(f"Attempting to submit {side} order for {qty} of {symbol}.")
+        self.rate_limiter.acquire()
         try:
             order = self.api.submit_order(
                 symbol=symbol,
                 qty=qty,
                 side=side,
                 type='market',
-                time_in_force='day' # 'day' is often safer for market orders
+                time_in_force='day', # 'day' is often safer for market orders
+                client_order_id=client_order_id
             )
-            message = f"✅ **{side.upper()} ORDER SUBMITTED** ✅\nSymbol: {symbol}\nQuantity: {qty}"
-            self.notifier.send_telegram_message(message)
-            print(message)
+            self._positions_dirty = True
+            self._notify_order_submitted(symbol, qty, side)
             return order
-        except APIError as e:
-            print(f"Error submitting {side} order for {symbol}: {e}")
-            error_message = f"⚠️ **ORDER FAILED** ⚠️\nSymbol: {symbol}\nSide: {side}\nError: {e}"
-            self.notifier.send_telegram_message(error_message)
+        except self._APIError as e:
+            self._notify_order_failed(symbol, side, e)
             return None
 
+    def _notify_order_unknown(self, symbol: str, side: str, error: Exception):
+        print(f"Could not confirm {side} order for {symbol}: {error}")
+        error_message = (f"❓ **ORDER STATUS UNKNOWN** ❓\nSymbol: {symbol}\nSide: {side}\nError: {error}\n"
+                         "Check the open orders before placing it again.")
+        self.notifier.send_telegram_message(error_message)
+
+    def _resubmit_order(self, symbol: str, qty: float, side: str, client_order_id: str, look_up: bool = True):
+        """
+        Retries an order whose first attempt failed. When that attempt may have reached Alpaca
+        (`look_up`), its client order id is looked up first, so an accepted order isn't placed twice.
+
+        Returns:
+            Order: The order, or None if it was rejected or its status could not be confirmed.
+        """
+        try:
+            if look_up:
+                self.rate_limiter.acquire()
+                try:
+                    order = self.api.get_order_by_client_order_id(client_order_id)
+                except self._APIError as e:
+                    # Only a 404 tells us the first attempt never reached Alpaca
+                    if e.status_code != 404:
+                        raise
+                else:
+                    self._positions_dirty = True
+                    self._notify_order_submitted(symbol, qty, side)
+                    return order
+            return self.submit_order(symbol, qty, side, client_order_id)
+        except (self._APIError, requests.exceptions.RequestException) as e:
+            # The order may have been placed, so positions are re-fetched on the next scan
+            self._positions_dirty = True
+            self._notify_order_unknown(symbol, side, e)
+            return None
+
+    async def _post_order(self, session, symbol: str, qty: float, side: str, client_order_id: str):
+        """
+        Posts one market order to the Alpaca REST API.
+
+        Returns:
+            Order: The submitted order.
+
+        Raises:
+            APIError: If Alpaca rejected the order (4xx other than 429).
+            Exception: On transport or server errors or rate limiting, where the order may be retried.
+        """
+        import aiohttp
+        from alpaca_trade_api.entity import Order
+
+        await self.rate_limiter.acquire_async()
+        print(f"Attempting to submit {side} order for {qty} of {symbol}.")
+        payload = {
+            'symbol': symbol,
+            'qty': str(qty),
+            'side': side,
+            'type': 'market',
+            'time_in_force': 'day',
+            'client_order_id': client_order_id,
+        }
+        async with session.post(f"{self.config.BASE_URL}/v2/orders", json=payload) as response:
+            body = await response.json(content_type=None)
+            if 400 <= response.status < 500 and response.status != 429:
+                raise self._APIError(body)
+            if response.status == 429 or response.status >= 500:
+                raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                                  status=response.status, message=str(body))
+            return Order(body)
+
+    async def _submit_async(self, orders: list):
+        """
+        Posts all orders concurrently over one pooled aiohttp session, throttled by the shared rate limiter.
+
+        Args:
+            orders (list): (symbol, qty, side, client_order_id) tuples.
+
+        Returns:
+            list: The Order, or the exception raised, for each order.
+        """
+        import aiohttp
+
+        headers = {'APCA-API-KEY-ID': self.config.API_KEY, 'APCA-API-SECRET-KEY': self.config.API_SECRET}
+        connector = aiohttp.TCPConnector(limit=self.config.ORDER_MAX_WORKERS)
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=timeout) as session:
+            tasks = [self._post_order(session, *order) for order in orders]
+            return await asyncio.gather(*tasks, return_exceptions=True)
+
+    def submit_orders(self, orders: list):
+        """
+        Submits several market orders concurrently, respecting the API rate limit.
+        Orders are posted asynchronously; any that hit a transport or server error, or were
+        rate limited, are retried through the SDK on a thread pool with the same client
+        order id. Orders that may have reached Alpaca are looked up by that id first.
+
+        Args:
+            orders (list): (symbol, qty, side) tuples.
+
+        Returns:
+            list: The submitted orders (None for failed ones), in the same order as `orders`.
+        """
+        if not orders:
+            return []
+
+        orders = [(symbol, qty, side, str(uuid.uuid4())) for symbol, qty, side in orders]
+        try:
+            results = asyncio.run(self._submit_async(orders))
+        except Exception as e:
+            print(f"Async order submission failed, falling back to the SDK: {e}")
+            results = [e] * len(orders)
+            sent = [False] * len(orders)
+        else:
+            import aiohttp
+            # Rate-limited orders were refused before being placed, so there is nothing to look up
+            sent = [not (isinstance(r, aiohttp.ClientResponseError) and r.status == 429) for r in results]
+
+        submitted = [None] * len(orders)
+        retry = []
+        for i, ((symbol, qty, side, _), result) in enumerate(zip(orders, results)):
+            if isinstance(result, self._APIError):
+                self._notify_order_failed(symbol, side, result)
+            elif isinstance(result, Exception):
+                retry.append(i)
+            else:
+                self._positions_dirty = True
+                self._notify_order_submitted(symbol, qty, side)
+                submitted[i] = result
+
+        if retry:
+            with ThreadPoolExecutor(max_workers=self.config.ORDER_MAX_WORKERS) as executor:
+                futures = {i: executor.submit(self._resubmit_order, *orders[i], sent[i]) for i in retry}
+                for i, future in futures.items():
+                    submitted[i] = future.result()
+        return submitted
+
     def evaluate_positions(self):
         """
         This method is conceptually useful but its logic is integrated into run_scan
@@ -81,6 +295,46 @@ class AlpacaTrader:
             print(f"{len(self.positions)} positions will be checked against the strategy.")
 
 
+    def _held_position_prices(self, symbols: list) -> dict:
+        """
+        Current prices for held positions, keyed by symbol.
+        Equity prices come from a single batched latest-trades request; other assets
+        fall back to the current price reported with the position.
+        """
+        prices = {symbol: float(self.positions[symbol].current_price) for symbol in symbols}
+        equities = [symbol for symbol in symbols if self.positions[symbol].asset_class == 'us_equity']
+        if equities:
+            try:
+                trades = self.api.get_latest_trades(equities)
+                prices.update({symbol: float(trade.price) for symbol, trade in trades.items()})
+            except self._APIError as e:
+                print(f"Error fetching latest trades for held positions: {e}")
+        return prices
+
+    @staticmethod
+    def _scan_symbol(position) -> str:
+        """
+        The symbol a position is listed under among the opportunities. Alpaca reports crypto
+        positions without the slash (BTCUSD), while the screeners and orders use BTC/USD.
+        """
+        symbol = position.symbol
+        if position.asset_class == 'crypto' and '/' not in symbol:
+            for quote in ('USDT', 'USDC', 'USD', 'BTC'):
+                if symbol.endswith(quote) and len(symbol) > len(quote):
+                    return f"{symbol[:-len(quote)]}/{quote}"
+        return symbol
+
+    @staticmethod
+    def _positions_df(positions: dict) -> pd.DataFrame:
+        """
+        Open positions as a DataFrame with 'alpaca_symbol' (the key of `positions`),
+        'position_symbol' (as reported by Alpaca), 'entry_price' and 'position_qty'.
+        """
+        return pd.DataFrame(
+            [(symbol, pos.symbol, float(pos.avg_entry_price), float(pos.qty)) for symbol, pos in positions.items()],
+            columns=['alpaca_symbol', 'position_symbol', 'entry_price', 'position_qty'],
+        ).astype({'entry_price': float, 'position_qty': float})
+
     def run_scan(self, opportunities_df: pd.DataFrame):
         """
         The main trading logic loop. It iterates through potential opportunities
@@ -90,33 +344,44 @@ class AlpacaTrader:
             print("No opportunities to scan.")
             return
             
+        # Free when the account was fetched recently (e.g. at start-up) and no order was placed since
         self._update_account_and_positions()
         buying_power = float(self.account_info.buying_power)
+        # Positions keyed like the opportunities, so a held crypto asset joins its own row
+        positions = {self._scan_symbol(pos): pos for pos in self.positions.values()}
         
-        # Combine opportunities with existing positions to evaluate all in one loop
-        all_symbols_to_check = set(opportunities_df['alpaca_symbol'].unique()) | set(self.positions.keys())
-        
-        print(f"\n--- Scanning {len(all_symbols_to_check)} total symbols (Opportunities + Positions) ---")
-        
-        for symbol in all_symbols_to_check:
-            # Get the asset data from the opportunities dataframe
-            asset_data_row = opportunities_df[opportunities_df['alpaca_symbol'] == symbol]
-            
-            if asset_data_row.empty:
-                # This happens for positions we hold that are not in today's "opportunity" list.
-                # A robust implementation would fetch fresh data for this specific symbol.
-                # For this version, we'll skip it to keep it simple.
-                # print(f"No fresh data for held position {symbol}, skipping evaluation.")
-                continue
-
-            asset_data = asset_data_row.iloc[0]
-            current_price = asset_data.get('Close')
-            
-            if pd.isna(current_price) or pd.isna(asset_data.get('rsi14')):
-                continue
+        # One row per symbol, with open positions joined on. Held positions that are not in
+        # today's "opportunity" list get a fresh price, so take profit / stop loss still apply to them.
+        scan_df = opportunities_df.drop_duplicates('alpaca_symbol').merge(
+            self._positions_df(positions), on='alpaca_symbol', how='outer', indicator=True
+        )
+        missing = scan_df['_merge'] == 'right_only'
+        if missing.any():
+            prices = self._held_position_prices(scan_df.loc[missing, 'position_symbol'].tolist())
+            scan_df.loc[missing, 'Symbol'] = scan_df.loc[missing, 'alpaca_symbol']
+            scan_df.loc[missing, 'Close'] = scan_df.loc[missing, 'position_symbol'].map(prices)
+        scan_df = scan_df.drop(columns='_merge')
+
+        # Only assets with a price, and indicator data unless held
+        held = scan_df['entry_price'].notna()
+        scan_df = scan_df[scan_df['Close'].notna() & (scan_df['rsi14'].notna() | held)]
+
+        # Drop assets the strategy would certainly HOLD before deciding anything
+        scan_df = scan_df[self.strategy.candidates_mask(scan_df, positions)]
 
-            existing_position = self.positions.get(symbol)
-            action = self.strategy.decide_action(asset_data, existing_position)
+        print(f"\n--- Scanning {len(scan_df)} symbols ({len(self.positions)} positions held) ---")
+
+        # Decide for every asset at once, then only walk the ones that need an order
+        scan_df = scan_df.assign(action=self.strategy.decide_actions(scan_df, positions))
+
+        # Orders are collected first and submitted together once all decisions are made
+        orders = []
+
+        for asset_data in scan_df[scan_df['action'] != Action.HOLD].itertuples(index=False):
+            action = asset_data.action
+            symbol = asset_data.alpaca_symbol
+            current_price = asset_data.Close
+            existing_position = not pd.isna(asset_data.entry_price)
 
             if action == Action.BUY and not existing_position:
                 # Calculate position size based on risk
@@ -133,10 +398,12 @@ class AlpacaTrader:
                     qty_to_buy = 1.0 / current_price # Adjust to $1 notional
                 
                 print(f"Decision: {action} {symbol}")
-                self.submit_order(symbol=symbol, qty=round(qty_to_buy, 5), side='buy')
+                orders.append((symbol, round(qty_to_buy, 5), 'buy'))
                 buying_power -= (qty_to_buy * current_price)
 
             elif action == Action.SELL and existing_position:
                 print(f"Decision: {action} {symbol}")
-                qty_to_sell = float(existing_position.qty)
-                self.submit_order(symbol=symbol, qty=qty_to_sell, side='sell')
+                qty_to_sell = asset_data.position_qty
+                orders.append((asset_data.position_symbol, qty_to_sell, 'sell'))
+
+        self.submit_orders(orders)